@@ -2,6 +2,7 @@
 # -------------------------------------------------------------------------
 # Run:
 #   pip install requests matplotlib
+#   pip install orjson        # optional, faster JSON decoding
 #   python weather_advisor_human_first.py
 #
 # Optional (Ollama for parsing; otherwise a fast rule-based parser is used):
@@ -9,15 +10,63 @@
 #   ollama pull llama3.1
 #   # set WEATHER_ADVISOR_DISABLE_OLLAMA=1 to disable Ollama
 
+import atexit
+import io
 import os
 import json
 import re
-import requests
-import matplotlib.pyplot as plt
+import string
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+try:  # optional: several times faster on wttr.in's ~50 KB j1 payload
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
 
 WTTR_TIMEOUT_SECS = 6
 OLLAMA_TIMEOUT_SECS = 4
 MAX_FORECAST_DAYS = 5
+MAX_PARALLEL_FETCHES = 8
+WORKER_POOL_SIZE = 16  # threads in each background pool (Ollama calls, /api/ask prefetches)
+WEATHER_CACHE_TTL_SECS = 600
+WEATHER_CACHE_MAX_ENTRIES = 64
+
+# --- Shared HTTP session: keep-alive sockets for wttr.in + Ollama ---
+# requests (and matplotlib, below) are imported on first use so the menu starts fast.
+# Pool is sized for the Flask server's threads plus get_weather_data_many(). Only
+# wttr.in gets retries, and only on 502/503/504 replies: connect/read timeouts are not
+# retried (each attempt already waits WTTR_TIMEOUT_SECS). Everything else, including
+# Ollama, fails fast with no retries.
+_SESSION = None
+_SESSION_LOCK = threading.Lock()
+
+def _get_session():
+    global _SESSION
+    if _SESSION is None:
+        with _SESSION_LOCK:
+            if _SESSION is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                from urllib3.util.retry import Retry
+                session = requests.Session()
+                # wttr.in gzips j1 well (~5x); requests decompresses r.content transparently
+                session.headers.update({"Connection": "keep-alive",
+                                        "Accept-Encoding": "gzip, deflate",
+                                        "User-Agent": "weather-advisor/1.0"})
+                retry = Retry(total=2, connect=0, read=0, other=0, backoff_factor=0.2,
+                              status_forcelist=[502, 503, 504])
+                plain = HTTPAdapter(pool_connections=10, pool_maxsize=20, max_retries=0)
+                session.mount("https://", plain)
+                session.mount("http://", plain)
+                # Longest prefix wins, so this only applies to wttr.in
+                session.mount("https://wttr.in/", HTTPAdapter(pool_connections=1, pool_maxsize=20, max_retries=retry))
+                atexit.register(session.close)
+                _SESSION = session
+    return _SESSION
 
 # --- Location sanitizer to prevent "Perth Tomorrow" 404s ---
 _TIME_TOKENS = {
@@ -27,27 +76,111 @@ _TIME_TOKENS = {
     "this"
 }
 _PREP_TOKENS = {"in", "at", "on", "for"}
+_DROP_TOKENS = frozenset(_TIME_TOKENS | _PREP_TOKENS)
+
+# Anything outside letters, spaces, hyphens, apostrophes and commas becomes a space.
+# ASCII is precomputed; other code points (accents, emoji, ...) map to " " without
+# being stored, so arbitrary client input can't grow the table.
+_KEEP_CHARS = frozenset(string.ascii_letters + " -',")
+
+class _KeepTable(dict):
+    def __missing__(self, codepoint):
+        return " "
+
+_KEEP_TABLE = _KeepTable({cp: (chr(cp) if chr(cp) in _KEEP_CHARS else " ") for cp in range(128)})
+
+# Rule parser: one left-to-right sweep over the lower-cased question picks up
+#   "in/at/for <place>" -> loc  (lookahead, so the place's words are still scanned below)
+#   "next N day(s)"     -> next
+#   any other word      -> word (matched against the keyword sets)
+_RULE_RE = re.compile(
+    r"\b(?:in|at|for)\s+(?=(?P<loc>[a-z][a-z\s\-']{1,60}))"
+    r"|\bnext\s+(?P<next>\d)\s+days?\b"
+    r"|(?P<word>[a-z]+)"
+)
+
+# Rule-parser keyword stems, matched at the start of a word (so "train" isn't rain but
+# "rainiest", "windspeed" and "hottest" count), checked in this priority order
+_ATTRIBUTE_STEMS = (
+    ("precipitation", ("rain", "umbrella", "precip")),
+    ("wind", ("wind", "gust")),
+    ("humidity", ("humid", "muggy")),
+    ("temperature", ("hot", "cold", "warm", "temp")),
+)
+# Words that start with a stem but aren't about the weather
+_NOT_ATTRIBUTE_WORDS = frozenset({"window", "windows", "hotel", "hotels", "temple", "temples",
+                                  "temporary", "temporarily"})
+
+# Word -> intent tags (a word can imply several, e.g. "raincoat")
+_TAG_WORDS = {
+    **dict.fromkeys(("umbrella", "umbrellas"), ("umbrella",)),
+    "raincoat": ("umbrella", "clothing"),
+    "raincoats": ("umbrella", "clothing"),
+    **dict.fromkeys(("windy", "gust", "gusts", "gusty"), ("windy",)),
+    **dict.fromkeys(("humid", "humidity", "muggy", "sticky"), ("humid",)),
+    **dict.fromkeys(("jacket", "jackets", "coat", "coats", "sweater", "sweaters",
+                     "hoodie", "hoodies"), ("clothing",)),
+    **dict.fromkeys(("run", "runs", "running", "picnic", "picnics", "beach", "beaches",
+                     "hike", "hikes", "hiking", "outdoor", "outdoors", "game", "games"), ("outdoors",)),
+    **dict.fromkeys(("cancel", "cancelled", "canceled", "safe", "safely", "safety", "unsafe",
+                     "dangerous", "storm", "storms", "stormy", "thunderstorm", "thunderstorms"), ("safety",)),
+}
+# "Will I feel cold?"-style tags need a temperature word plus a feel/"will i"/"do i" cue
+_FEEL_TAGS = {"cold": "feel_cold", "colder": "feel_cold",
+              "warm": "feel_warm", "warmer": "feel_warm",
+              "hot": "feel_hot", "hotter": "feel_hot"}
+_FEEL_WORDS = frozenset({"feel", "feels", "feeling"})
+
+class SanitizedLocation(str):
+    """A location string that has already been through sanitize_location() (so it's skipped next time)."""
+    __slots__ = ()
 
 def sanitize_location(raw: str) -> str:
+    if isinstance(raw, SanitizedLocation):
+        return raw
     if not isinstance(raw, str):
         return ""
-    cleaned = re.sub(r"[^A-Za-z\s\-\',]", " ", raw.strip())
-    parts = [p for p in re.split(r"[,\s]+", cleaned) if p]
-    keep = []
-    for p in parts:
-        low = p.lower()
-        if low in _TIME_TOKENS:  # drop time words
-            continue
-        if low in _PREP_TOKENS:  # drop prepositions
-            continue
-        if low.isdigit():        # drop numbers
-            continue
-        keep.append(p)
-    return " ".join(keep).strip(" ,")
+    return _sanitize_cached(raw)
+
+# Called several times per request with a handful of distinct strings
+@lru_cache(maxsize=1024)
+def _sanitize_cached(raw: str) -> SanitizedLocation:
+    cleaned = raw.strip().translate(_KEEP_TABLE)
+    # Digits were already blanked by the translate table, so only words need dropping
+    keep = [p for p in cleaned.replace(",", " ").split() if p.lower() not in _DROP_TOKENS]
+    return SanitizedLocation(" ".join(keep))
 
 # ------------------------------
 # 1) Data retrieval (wttr.in)
 # ------------------------------
+# (location.lower(), days) -> (fetched_at, weather_data); dict order doubles as LRU order
+_WEATHER_CACHE = {}
+_CACHE_LOCK = threading.Lock()
+# key -> _Flight for the fetch already running for that key (single-flight)
+_INFLIGHT = {}
+
+class _Flight:
+    """One in-progress wttr.in fetch; waiters block on `done`, then share `result`."""
+    __slots__ = ("done", "result")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+
+def _cache_get(key):
+    with _CACHE_LOCK:
+        hit = _WEATHER_CACHE.pop(key, None)
+        if hit is None or time.monotonic() - hit[0] >= WEATHER_CACHE_TTL_SECS:
+            return None
+        _WEATHER_CACHE[key] = hit  # re-insert as most recently used
+        return hit[1]
+
+def _cache_put(key, data):
+    with _CACHE_LOCK:
+        _WEATHER_CACHE[key] = (time.monotonic(), data)
+        while len(_WEATHER_CACHE) > WEATHER_CACHE_MAX_ENTRIES:
+            del _WEATHER_CACHE[next(iter(_WEATHER_CACHE))]
+
 def get_weather_data(location, forecast_days=5):
     location = sanitize_location(location)
     if not location:
@@ -55,41 +188,113 @@ def get_weather_data(location, forecast_days=5):
         return None
 
     days = max(1, min(MAX_FORECAST_DAYS, int(forecast_days or 3)))
+    key = (location.lower(), days)
+    cached = _cache_get(key)
+    if cached is not None:
+        return cached
+
+    # Identical misses at the same time (e.g. the UI's chart + chat calls) share one
+    # fetch, including its failure: waiters don't pile onto a failing upstream. The
+    # wait is bounded by the leader's own request timeout.
+    with _CACHE_LOCK:
+        flight = _INFLIGHT.get(key)
+        leader = flight is None
+        if leader:
+            flight = _INFLIGHT[key] = _Flight()
+    if not leader:
+        flight.done.wait()
+        return flight.result
+
+    try:
+        flight.result = _fetch_weather(location, days, key)
+        return flight.result
+    finally:
+        with _CACHE_LOCK:
+            del _INFLIGHT[key]
+        flight.done.set()
+
+def _fetch_weather(location, days, key):
     url = f"https://wttr.in/{location}?format=j1"
 
     try:
-        r = requests.get(url, timeout=WTTR_TIMEOUT_SECS)
+        r = _get_session().get(url, timeout=WTTR_TIMEOUT_SECS)
         r.raise_for_status()
-        data = r.json()
+        data = _loads(r.content)
 
         current = (data.get("current_condition") or [{}])[0]
         forecast_raw = data.get("weather") or []
         forecast = forecast_raw[:days]  # wttr.in typically returns 3 days
 
-        return {"location": location.title(), "current": current, "forecast": forecast}
+        result = {"location": location.title(), "current": current, "forecast": forecast}
+        _cache_put(key, result)
+        return result
     except Exception as e:
         print(f"[Network] Could not get weather data for '{location}': {e}")
         return None
 
+def get_weather_data_many(locations, forecast_days=5):
+    """
+    Fetch several locations concurrently over the shared session.
+    Returns a list in the same order as `locations` (None where a fetch failed).
+    """
+    locations = list(locations)
+    if not locations:
+        return []
+    workers = min(MAX_PARALLEL_FETCHES, len(locations))
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        return list(ex.map(lambda loc: get_weather_data(loc, forecast_days), locations))
+
 # -------------------------------------------
 # 2) Visualisation: Temperature (min/avg/max)
 # -------------------------------------------
+# output_type: 'display' (window), 'figure' (return the Figure) or 'bytes' (return PNG bytes)
+def _new_chart(output_type):
+    # Only an on-screen chart needs pyplot (and its GUI backend); returned
+    # figures/PNGs use a bare Figure rendered with Agg.
+    if output_type in ('figure', 'bytes'):
+        from matplotlib.figure import Figure
+        fig = Figure(figsize=(8, 4.5))
+        return fig, fig.subplots()
+    import matplotlib.pyplot as plt
+    return plt.subplots(figsize=(8, 4.5))
+
+def _finish_chart(fig, output_type):
+    if output_type == 'figure':
+        return fig
+    if output_type == 'bytes':
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        buf = io.BytesIO()
+        FigureCanvasAgg(fig).print_png(buf)
+        return buf.getvalue()
+    import matplotlib.pyplot as plt
+    plt.show()
+    return None
+
+def _safe_float(x):
+    try: return float(x)
+    except (TypeError, ValueError): return 0.0
+
+def daily_temperatures(forecast):
+    """Yields min, avg, max °C for each forecast day in turn (flat, 3 per day; bad values -> 0.0)."""
+    for d in forecast:
+        yield _safe_float(d.get("mintempC"))
+        yield _safe_float(d.get("avgtempC"))
+        yield _safe_float(d.get("maxtempC"))
+
 def create_temperature_visualisation(weather_data, output_type='display'):
     if not weather_data or "forecast" not in weather_data:
         print("No weather data supplied.")
         return None
 
-    dates, mins, avgs, maxs = [], [], [], []
-    for day in weather_data["forecast"]:
-        dates.append(day.get("date", ""))
-        def f(x):
-            try: return float(x)
-            except: return 0.0
-        mins.append(f(day.get("mintempC", 0)))
-        avgs.append(f(day.get("avgtempC", 0)))
-        maxs.append(f(day.get("maxtempC", 0)))
-
-    fig, ax = plt.subplots(figsize=(8, 4.5))
+    import numpy as np  # ships with matplotlib
+
+    forecast = weather_data["forecast"]
+    dates = [d.get("date", "") for d in forecast]
+    temps = np.fromiter(daily_temperatures(forecast), dtype=np.float32,
+                        count=3 * len(forecast)).reshape(-1, 3)
+    mins, avgs, maxs = temps.T
+
+    fig, ax = _new_chart(output_type)
     ax.plot(dates, mins, marker='o', label='Min °C')
     ax.plot(dates, avgs, marker='o', label='Avg °C')
     ax.plot(dates, maxs, marker='o', label='Max °C')
@@ -98,10 +303,7 @@ def create_temperature_visualisation(weather_data, output_type='display'):
     ax.grid(True, linestyle='--', alpha=0.4)
     ax.legend()
 
-    if output_type == 'figure':
-        return fig
-    plt.show()
-    return None
+    return _finish_chart(fig, output_type)
 
 # ---------------------------------------------------
 # 3) Visualisation: Precipitation chance (daily max)
@@ -111,27 +313,19 @@ def create_precipitation_visualisation(weather_data, output_type='display'):
         print("No weather data supplied.")
         return None
 
-    dates, rain_chance = [], []
-    for day in weather_data["forecast"]:
-        dates.append(day.get("date", ""))
-        max_chance = 0
-        for h in (day.get("hourly") or []):
-            try:
-                c = int(h.get("chanceofrain", 0))
-                if c > max_chance: max_chance = c
-            except: pass
-        rain_chance.append(max_chance)
-
-    fig, ax = plt.subplots(figsize=(8, 4.5))
+    import numpy as np
+
+    forecast = weather_data["forecast"]
+    dates = [d.get("date", "") for d in forecast]
+    rain_chance = np.fromiter((max_rain_chance(d) for d in forecast), dtype=np.float32, count=len(forecast))
+
+    fig, ax = _new_chart(output_type)
     ax.plot(dates, rain_chance, marker='o', label='Chance of Rain (%)')
     ax.set_title(f"Precipitation Chances - {weather_data.get('location', '')}")
     ax.set_xlabel("Date"); ax.set_ylabel("Chance of Rain (%)")
     ax.set_ylim(0, 100); ax.grid(True, linestyle='--', alpha=0.4); ax.legend()
 
-    if output_type == 'figure':
-        return fig
-    plt.show()
-    return None
+    return _finish_chart(fig, output_type)
 
 # ------------------------------
 # 4) Natural Language Interface
@@ -139,25 +333,76 @@ def create_precipitation_visualisation(weather_data, output_type='display'):
 def _ollama_disabled():
     return os.environ.get("WEATHER_ADVISOR_DISABLE_OLLAMA", "").strip() == "1"
 
+# requests' timeout is per socket operation, so a stalled DNS lookup or connect can
+# still block well past it. The call runs on a worker and we stop waiting at the
+# deadline. Callers should not outnumber the workers (weatherapp.py runs that many
+# server threads), so a call never spends its deadline queued behind another's.
+_LLM_POOL = ThreadPoolExecutor(max_workers=WORKER_POOL_SIZE, thread_name_prefix="ollama")
+
 def _call_ollama(prompt, model=None, temperature=0.0, json_only=True):
     if _ollama_disabled():
         return None
+    fut = _LLM_POOL.submit(_ollama_generate, prompt, model, temperature, json_only)
+    try:
+        return fut.result(timeout=OLLAMA_TIMEOUT_SECS)
+    except Exception:  # includes the deadline's TimeoutError
+        fut.cancel()
+        return None
+
+def _ollama_generate(prompt, model, temperature, json_only):
     try:
         host = os.environ.get("OLLAMA_HOST", "http://127.0.0.1:11434")
         url = f"{host}/api/generate"
         model = model or os.environ.get("WEATHER_ADVISOR_OLLAMA_MODEL", "llama3.1")
         payload = {"model": model, "prompt": prompt,
                    "options": {"temperature": temperature}, "stream": False}
-        res = requests.post(url, json=payload, timeout=OLLAMA_TIMEOUT_SECS)
+        res = _get_session().post(url, json=payload, timeout=OLLAMA_TIMEOUT_SECS)
         res.raise_for_status()
-        text = res.json().get("response", "").strip()
+        text = _loads(res.content).get("response", "").strip()
         if json_only:
-            s, e = text.find("{"), text.rfind("}")
-            if s != -1 and e != -1: text = text[s:e+1]
+            text = _first_json_object(text)
         return text
     except Exception:
         return None
 
+_RE_JSON_STRUCT = re.compile(r'[{}"\\]')
+
+def _first_json_object(text):
+    """
+    Slice the first complete {...} out of LLM output (models like to add prose around it).
+    The outermost-brace slice is tried first and kept if it decodes. Only when it doesn't
+    (braces in strings or in the surrounding prose) is there a forward scan over the
+    structural characters, ignoring braces inside strings. Returns text unchanged if no
+    object closes.
+    """
+    s, e = text.find("{"), text.rfind("}")
+    if s == -1 or e < s:
+        return text
+    candidate = text[s:e + 1]
+    try:
+        _loads(candidate)
+        return candidate
+    except ValueError:  # json's and orjson's decode errors are both ValueErrors
+        pass
+    depth, start, in_str, escaped_at = 0, -1, False, -1
+    for m in _RE_JSON_STRUCT.finditer(text):
+        ch, i = m.group(), m.start()
+        if in_str:
+            if ch == "\\" and escaped_at != i:
+                escaped_at = i + 1      # next char is escaped
+            elif ch == '"' and escaped_at != i:
+                in_str = False
+        elif ch == '"':
+            in_str = True
+        elif ch == "{":
+            if depth == 0: start = i
+            depth += 1
+        elif ch == "}" and depth:
+            depth -= 1
+            if depth == 0:
+                return text[start:i + 1]
+    return text
+
 # --- Intent + parsing ---
 def parse_weather_question(question):
     """
@@ -172,70 +417,139 @@ def parse_weather_question(question):
     if not qorig:
         return {"location": None, "days": 3, "when": "today", "attribute": "summary", "tags": set(), "question_text": ""}
 
-    qlow = qorig.lower()
-
+    # Same words, different case/spacing -> same cache entry
+    loc, days, when, attribute, tags = _parse_question(" ".join(qorig.lower().split()))
+    return {"location": loc, "days": days, "when": when, "attribute": attribute, "tags": set(tags), "question_text": qorig}
+
+def _parse_question(qlow):
+    """Parse a normalised (lower-case, single-spaced) question -> (location, days, when, attribute, frozenset(tags))."""
+    # Rule-based parse first: it's instant and handles most questions on its own
+    rules = _rule_parse_question(qlow)
+    loc, days, when, attribute, tags = rules
+    if _is_confident(loc, when, attribute, tags):
+        return rules
+    # Ambiguous to the rules: ask the LLM, falling back to the rules if it can't answer
+    try:
+        return _llm_parse_question(qlow, tags)
+    except _LLMUnavailable:
+        return rules
+
+class _LLMUnavailable(Exception):
+    """Ollama was wanted but gave no usable answer (disabled, down, timed out, bad JSON)."""
+
+# Both parses are memoised, but the LLM one raises instead of returning on failure:
+# lru_cache doesn't cache exceptions, so a temporary Ollama outage isn't remembered.
+@lru_cache(maxsize=128)
+def _rule_parse_question(qlow):
+    loc, days, when, attribute, words = _rule_based_parse(qlow)
     # Tags capture user's intent nuances for humanised answers
-    tags = set()
-    if any(w in qlow for w in ["umbrella", "raincoat"]): tags.add("umbrella")
-    if "feel cold" in qlow or ("cold" in qlow and ("feel" in qlow or "will i" in qlow or "do i" in qlow)): tags.add("feel_cold")
-    if "feel warm" in qlow or ("warm" in qlow and ("feel" in qlow or "will i" in qlow or "do i" in qlow)): tags.add("feel_warm")
-    if "feel hot"  in qlow or ("hot"  in qlow and ("feel" in qlow or "will i" in qlow or "do i" in qlow)): tags.add("feel_hot")
-    if any(w in qlow for w in ["windy", "strong wind", "gust"]): tags.add("windy")
-    if any(w in qlow for w in ["humid", "muggy", "sticky"]): tags.add("humid")
-    if any(w in qlow for w in ["jacket", "coat", "sweater", "hoodie"]): tags.add("clothing")
-    if any(w in qlow for w in ["run", "picnic", "beach", "hike", "outdoor", "game"]): tags.add("outdoors")
-    if any(w in qlow for w in ["cancel", "safe", "dangerous", "storm"]): tags.add("safety")
-
-    # Try LLM parse first (fast timeout)
+    tags = frozenset(_question_tags(qlow, words))
+    return loc, days, when, attribute, tags
+
+@lru_cache(maxsize=128)
+def _llm_parse_question(qlow, tags):
     system = (
         "You are a weather question parser. Output JSON with keys: "
         "location (string|null), days (1..5), when ('today'|'tomorrow'|'next_n_days'), "
         "attribute ('temperature'|'rain'|'precipitation'|'wind'|'humidity'|'summary'). "
         "If 'this weekend' -> next_n_days + days=3. Default: location=null, days=3, when='today', attribute='summary'."
     )
-    prompt = f"{system}\nUser question: {qorig}\nJSON:"
+    prompt = f"{system}\nUser question: {qlow}\nJSON:"
     llm_text = _call_ollama(prompt, json_only=True)
+    if not llm_text:
+        raise _LLMUnavailable()
+
+    try:
+        p = _loads(llm_text)
+        loc = sanitize_location(p.get("location") or "") or None
+        days = max(1, min(MAX_FORECAST_DAYS, int(p.get("days", 3))))
+        when = p.get("when", "today")
+        if when not in ("today","tomorrow","next_n_days"): when = "today"
+        attr = p.get("attribute","summary")
+        if attr not in ("temperature","rain","precipitation","wind","humidity","summary"):
+            attr = "summary"
+    except Exception as e:
+        raise _LLMUnavailable() from e
+    return loc, days, when, attr, tags
 
-    if llm_text:
-        try:
-            p = json.loads(llm_text)
-            loc = sanitize_location(p.get("location") or "") or None
-            days = max(1, min(MAX_FORECAST_DAYS, int(p.get("days", 3))))
-            when = p.get("when", "today")
-            if when not in ("today","tomorrow","next_n_days"): when = "today"
-            attr = p.get("attribute","summary")
-            if attr not in ("temperature","rain","precipitation","wind","humidity","summary"):
-                attr = "summary"
-            return {"location": loc, "days": days, "when": when, "attribute": attr, "tags": tags, "question_text": qorig}
-        except Exception:
-            pass
-
-    # Rule-based fallback
-    loc = None
-    m = re.search(r"\b(?:in|at|for)\s+([A-Za-z][A-Za-z\s\-']{1,60})", qlow)
-    if m:
-        loc = sanitize_location(m.group(1)) or None
+# Runs wttr.in prefetches for parse_and_fetch() while the question is still being parsed
+_PREFETCH_POOL = ThreadPoolExecutor(max_workers=WORKER_POOL_SIZE, thread_name_prefix="prefetch")
+
+def parse_and_fetch(question, default_location=""):
+    """
+    parse_weather_question() + get_weather_data(), overlapped: when the parse has to ask
+    the LLM, the wttr.in fetch for the rule parser's location guess starts meanwhile, and
+    is only redone if the final location/days differ. Otherwise both run inline.
+    Returns (parsed, weather_data); parsed["location"] falls back to default_location,
+    weather_data is None when there's no location or the fetch failed.
+    """
+    qlow = " ".join((question or "").lower().split())
+    prefetch = guess_loc = guess_days = None
+    if qlow and not _ollama_disabled():
+        rules = _rule_parse_question(qlow)  # memoised, so the parse below reuses it
+        if not _is_confident(rules[0], *rules[2:]):
+            guess_loc, guess_days = rules[:2]
+            guess_loc = guess_loc or sanitize_location(default_location)
+            if guess_loc:
+                prefetch = _PREFETCH_POOL.submit(get_weather_data, guess_loc, guess_days)
+
+    parsed = parse_weather_question(question)
+    loc = parsed.get("location") or sanitize_location(default_location)
+    parsed["location"] = loc
+    if not loc:
+        if prefetch is not None: prefetch.cancel()
+        return parsed, None
+
+    days = parsed.get("days", 3)
+    if prefetch is not None and guess_loc.lower() == loc.lower() and guess_days == days:
+        return parsed, prefetch.result()
+    return parsed, get_weather_data(loc, forecast_days=days)
+
+def _is_confident(loc, when, attribute, tags):
+    """Rules found a place plus something specific to say about it -> no need for the LLM."""
+    return bool(loc) and (attribute != "summary" or when != "today" or bool(tags))
+
+def _rule_based_parse(qlow):
+    """
+    Keyword/regex parse of a lower-cased question in one _RULE_RE sweep
+    -> (location, days, when, attribute, words)
+    """
+    loc = next_n = None
+    words = set()
+    for m in _RULE_RE.finditer(qlow):
+        word = m.group("word")
+        if word is not None:
+            words.add(word)
+        elif m.group("next") is not None:
+            if next_n is None: next_n = int(m.group("next"))
+        elif loc is None:
+            loc = sanitize_location(m.group("loc")) or None
 
     days, when = 3, "today"
-    if "tomorrow" in qlow: when, days = "tomorrow", 1
-    m = re.search(r"\bnext\s+(\d)\s+day", qlow)
-    if m:
+    if "tomorrow" in words: when, days = "tomorrow", 1
+    if next_n is not None:
         when = "next_n_days"
-        days = max(1, min(MAX_FORECAST_DAYS, int(m.group(1))))
-    if "weekend" in qlow: when, days = "next_n_days", 3
-
-    if any(w in qlow for w in ["rain", "umbrella", "precip"]):
-        attribute = "precipitation"
-    elif any(w in qlow for w in ["windy", "wind", "gust"]):
-        attribute = "wind"
-    elif any(w in qlow for w in ["humid", "humidity", "muggy"]):
-        attribute = "humidity"
-    elif any(w in qlow for w in ["hot", "cold", "warm", "temp", "temperature"]):
-        attribute = "temperature"
+        days = max(1, min(MAX_FORECAST_DAYS, next_n))
+    if "weekend" in words or "weekends" in words: when, days = "next_n_days", 3
+
+    candidates = words - _NOT_ATTRIBUTE_WORDS
+    for attribute, stems in _ATTRIBUTE_STEMS:
+        if any(w.startswith(stems) for w in candidates):
+            break
     else:
         attribute = "summary"
 
-    return {"location": loc, "days": days, "when": when, "attribute": attribute, "tags": tags, "question_text": qorig}
+    return loc, days, when, attribute, words
+
+def _question_tags(qlow, words):
+    """Intent tags from the question's word set (plus the odd phrase check on qlow)."""
+    tags = {tag for w in words & _TAG_WORDS.keys() for tag in _TAG_WORDS[w]}
+    if "strong" in words and "strong wind" in qlow:
+        tags.add("windy")
+    feel = words & _FEEL_TAGS.keys()
+    if feel and (not words.isdisjoint(_FEEL_WORDS) or "will i" in qlow or "do i" in qlow):
+        tags.update(_FEEL_TAGS[w] for w in feel)
+    return tags
 
 # --- helpers for humanized responses ---
 def _pick_day_slice(weather_data, when, days):
@@ -245,51 +559,72 @@ def _pick_day_slice(weather_data, when, days):
     if when == "next_n_days": return days_list[:days]
     return days_list[:1]  # today
 
-def _max_rain_chance(day):
-    max_r = 0
-    for h in (day.get("hourly") or []):
-        try:
-            c = int(h.get("chanceofrain", 0))
-            if c > max_r: max_r = c
-        except: pass
-    return max_r
+_MIDDAY_TIMES = ("1200", "900", "1500")
+
+def _hour_int(h, key):
+    # wttr.in sends hourly numbers as digit strings; anything else is skipped.
+    # Checked up front because a try/except around int() costs more per hour.
+    v = h.get(key, 0)
+    if type(v) is int: return v
+    if type(v) is str and v.isdecimal(): return int(v)
+    return None
+
+def _day_stats(day):
+    """Hourly aggregates for a forecast day, computed once and cached on the dict as "_stats"."""
+    stats = day.get("_stats")
+    if stats is None:
+        stats = day["_stats"] = _hourly_stats(day.get("hourly") or ())
+    return stats
+
+def _hourly_stats(hourly):
+    """
+    One pass over a day's hourly entries:
+      { rain: max chance %, wind: max km/h, humidity: avg %, desc: midday description|None }
+    """
+    max_r = max_w = total_h = count_h = 0
+    midday_desc = first_desc = None
+    midday_seen = False
+    for h in hourly:
+        c = _hour_int(h, "chanceofrain")
+        if c is not None and c > max_r: max_r = c
+        w = _hour_int(h, "windspeedKmph")
+        if w is not None and w > max_w: max_w = w
+        v = _hour_int(h, "humidity")
+        if v is not None:
+            total_h += v; count_h += 1
+        wdesc = h.get("weatherDesc")
+        desc = wdesc[0].get("value") if isinstance(wdesc, list) and wdesc else None
+        if desc is not None and first_desc is None:
+            first_desc = desc
+        if not midday_seen and h.get("time") in _MIDDAY_TIMES:
+            midday_seen, midday_desc = True, desc
+
+    return {
+        "rain": max_r,
+        "wind": max_w,
+        "humidity": int(round(total_h / count_h)) if count_h else 0,
+        "desc": midday_desc if midday_desc is not None else first_desc,
+    }
+
+def max_rain_chance(day):
+    """Highest hourly chance of rain (%) for a forecast day."""
+    return _day_stats(day)["rain"]
 
 def _wind_max_kmph(day):
-    max_w = 0
-    for h in (day.get("hourly") or []):
-        try:
-            w = int(h.get("windspeedKmph", 0))
-            if w > max_w: max_w = w
-        except: pass
-    return max_w
+    return _day_stats(day)["wind"]
 
 def _avg_humidity(day):
-    total = count = 0
-    for h in (day.get("hourly") or []):
-        try:
-            total += int(h.get("humidity", 0)); count += 1
-        except: pass
-    return int(round(total / count)) if count else 0
+    return _day_stats(day)["humidity"]
 
 def _midday_desc(day):
-    for h in (day.get("hourly") or []):
-        if h.get("time") in ("1200","900","1500"):
-            wdesc = h.get("weatherDesc")
-            if isinstance(wdesc, list) and wdesc:
-                return wdesc[0].get("value")
-            break
-    for h in (day.get("hourly") or []):
-        wdesc = h.get("weatherDesc")
-        if isinstance(wdesc, list) and wdesc:
-            return wdesc[0].get("value")
-    return None
+    return _day_stats(day)["desc"]
 
 def _day_brief(day):
     date = day.get("date", "Unknown date")
     avgc = day.get("avgtempC", "?")
     minc = day.get("mintempC", "?")
     maxc = day.get("maxtempC", "?")
-    chance = _max_rain_chance(day)
+    chance = max_rain_chance(day)
     desc = _midday_desc(day) or "—"
     return f"{date}: ~{avgc}°C (min {minc}°C / max {maxc}°C), rain up to {chance}%, {desc}"
 
@@ -309,7 +644,7 @@ def _feel_label(avgc_int):
 
 def _pleasant_yesno(day):
     avgc = _to_int(day.get("avgtempC"))
-    rain = _max_rain_chance(day)
+    rain = max_rain_chance(day)
     wind = _wind_max_kmph(day)
     hum  = _avg_humidity(day)
 
@@ -324,6 +659,8 @@ def _pleasant_yesno(day):
     return "Yes, it should be pleasant."
 
 # --- universal human-first sentence ---
+_RE_QVERB = re.compile(r"^\s*(do|should|will|is|can|are|am)\b")
+
 def _human_first_sentence(parsed, weather_data, day):
     q = (parsed.get("question_text") or "").lower()
     when_txt = parsed.get("when", "today").replace("_"," ")
@@ -333,7 +670,7 @@ def _human_first_sentence(parsed, weather_data, day):
     avgc = _to_int(day.get("avgtempC"))
     minc = day.get("mintempC", "?")
     maxc = day.get("maxtempC", "?")
-    rain = _max_rain_chance(day)
+    rain = max_rain_chance(day)
     wind = _wind_max_kmph(day)
     hum  = _avg_humidity(day)
 
@@ -380,7 +717,7 @@ def _human_first_sentence(parsed, weather_data, day):
         return f"{verdict} {when_txt} in {loc}"
 
     # 7) Generic nice yes/no for any other “Do/Should/Will/Is/Can … ?” style
-    if re.match(r"^\s*(do|should|will|is|can|are|am)\b", q):
+    if _RE_QVERB.match(q):
         verdict = _pleasant_yesno(day)
         return f"{verdict} {when_txt} in {loc}"
 
@@ -3,6 +3,8 @@
 # UI server for Weather Advisor (uses functions from test.py)
 # Run:
 #   pip install flask requests
+#   pip install orjson        # optional, faster JSON
+#   pip install waitress      # optional, multi-threaded server (else Flask dev server)
 #   python weatherapp.py
 #
 # Folder structure:
@@ -22,11 +24,77 @@ from test import (
     sanitize_location,
     get_weather_data,
     parse_weather_question,
+    parse_and_fetch,
     generate_weather_response,
+    daily_temperatures,
+    max_rain_chance,
+    WORKER_POOL_SIZE,
 )
 
+try:  # optional: faster serialisation for the chart endpoints
+    import orjson
+except ImportError:
+    orjson = None
+
 app = Flask(__name__, template_folder="templates", static_folder="static")
 
+# One server thread per test.py pool worker, so no request waits on a busy pool
+SERVER_THREADS = WORKER_POOL_SIZE
+
+
+def _cached_json(wd, name, build):
+    """
+    JSON response for build(wd), serialised once and kept on the weather dict.
+    get_weather_data() hands back the same cached dict for a (location, days)
+    until its TTL expires, so repeat chart requests reuse the encoded body.
+    """
+    bodies = wd.setdefault("_json", {})
+    body = bodies.get(name)
+    if body is None:
+        payload = build(wd)
+        body = bodies[name] = orjson.dumps(payload) if orjson else app.json.dumps(payload)
+    return app.response_class(body, mimetype="application/json")
+
+
+def _temps_payload(wd):
+    forecast = wd.get("forecast", [])
+    temps = list(daily_temperatures(forecast))
+    return {
+        "location": wd.get("location", ""),
+        "dates": [day.get("date", "") for day in forecast],
+        "min": temps[0::3], "avg": temps[1::3], "max": temps[2::3],
+    }
+
+
+def _rain_payload(wd):
+    forecast = wd.get("forecast", [])
+    return {
+        "location": wd.get("location", ""),
+        "dates": [day.get("date", "") for day in forecast],
+        "chance": [max_rain_chance(day) for day in forecast],
+    }
+
+
+def _bundle_payload(wd):
+    return {"temps": _temps_payload(wd), "rain": _rain_payload(wd)}
+
+
+def _bundle_answer(question, location, days, wd):
+    """
+    Answer for /api/bundle's optional question. The bundle's location is the default;
+    its forecast is reused only when the question asks about that same location within
+    its span, otherwise the question's own forecast is fetched.
+    """
+    parsed = parse_weather_question(question)
+    loc = parsed.get("location") or location
+    parsed["location"] = loc
+    q_days = parsed.get("days", 3)
+    if loc.lower() != location.lower() or q_days > days:
+        wd = get_weather_data(loc, forecast_days=q_days)
+    if not wd:
+        return "Sorry, I couldn't retrieve weather data right now."
+    return generate_weather_response(parsed, wd)
+
 
 @app.get("/")
 def home():
@@ -53,22 +121,7 @@ def api_temps():
     if not wd:
         return jsonify({"error": f"Could not fetch weather for '{location}'."}), 502
 
-    dates, mins, avgs, maxs = [], [], [], []
-    for day in wd.get("forecast", []):
-        dates.append(day.get("date", ""))
-        def f(x):
-            try:
-                return float(x)
-            except Exception:
-                return 0.0
-        mins.append(f(day.get("mintempC", 0)))
-        avgs.append(f(day.get("avgtempC", 0)))
-        maxs.append(f(day.get("maxtempC", 0)))
-
-    return jsonify({
-        "location": wd.get("location", location.title()),
-        "dates": dates, "min": mins, "avg": avgs, "max": maxs
-    })
+    return _cached_json(wd, "temps", _temps_payload)
 
 
 @app.get("/api/rain")
@@ -91,26 +144,37 @@ def api_rain():
     if not wd:
         return jsonify({"error": f"Could not fetch weather for '{location}'."}), 502
 
-    def max_rain(day):
-        max_r = 0
-        for h in (day.get("hourly") or []):
-            try:
-                c = int(h.get("chanceofrain", 0))
-                if c > max_r:
-                    max_r = c
-            except Exception:
-                pass
-        return max_r
+    return _cached_json(wd, "rain", _rain_payload)
+
+
+@app.get("/api/bundle")
+def api_bundle():
+    """
+    Both dashboard charts from a single wttr.in fetch:
+    {
+      "temps": { ...same as /api/temps... },
+      "rain":  { ...same as /api/rain... },
+      "answer": "..."   # only when a 'question' param is given
+    }
+    """
+    loc_in = request.args.get("location", "", type=str)
+    days = request.args.get("days", default=3, type=int)
+    question = request.args.get("question", "", type=str).strip()
+    location = sanitize_location(loc_in)
+    if not location:
+        raise BadRequest("Please provide a valid 'location'.")
+
+    wd = get_weather_data(location, forecast_days=days)
+    if not wd:
+        return jsonify({"error": f"Could not fetch weather for '{location}'."}), 502
 
-    dates, chances = [], []
-    for day in wd.get("forecast", []):
-        dates.append(day.get("date", ""))
-        chances.append(max_rain(day))
+    if not question:
+        return _cached_json(wd, "bundle", _bundle_payload)
 
-    return jsonify({
-        "location": wd.get("location", location.title()),
-        "dates": dates, "chance": chances
-    })
+    # The answer is per-question, so this response is built fresh, not cached on wd
+    payload = _bundle_payload(wd)
+    payload["answer"] = _bundle_answer(question, location, days, wd)
+    return jsonify(payload)
 
 
 @app.post("/api/ask")
@@ -127,21 +191,15 @@ def api_ask():
     if not question:
         raise BadRequest("Missing 'question'.")
 
-    parsed = parse_weather_question(question)
-    # If the question didn't include a detectable location,
-    # use a provided default (if any).
-    loc = parsed.get("location")
-    if not loc:
-        loc = sanitize_location(default_loc_in)
-        parsed["location"] = loc
+    # Parses the question and fetches the forecast in parallel. If the question
+    # didn't include a detectable location, the provided default (if any) is used.
+    parsed, wd = parse_and_fetch(question, default_loc_in)
 
     if not parsed.get("location"):
         return jsonify({
             "answer": "Please include a location in your question or set a default location."
         })
 
-    days = parsed.get("days", 3)
-    wd = get_weather_data(parsed["location"], forecast_days=days)
     if not wd:
         return jsonify({"answer": "Sorry, I couldn't retrieve weather data right now."}), 502
 
@@ -155,5 +213,11 @@ def healthz():
 
 
 if __name__ == "__main__":
-    # Windows-friendly dev server
-    app.run(host="127.0.0.1", port=5000, debug=True)
+    try:
+        # Windows-friendly production server; its threads overlap slow wttr.in/Ollama calls
+        from waitress import serve
+    except ImportError:
+        # Dev server fallback (threaded, so one slow fetch doesn't block other requests)
+        app.run(host="127.0.0.1", port=5000, debug=True, threaded=True)
+    else:
+        serve(app, host="127.0.0.1", port=5000, threads=SERVER_THREADS)